@@ -1,52 +1,97 @@
 # type: ignore  # noqa: PGH003
 """Fixtures for pytest."""
 
+import shutil
+from dataclasses import dataclass
 from pathlib import Path
 
 import pytest
+from django.core.management import call_command
+from django.db import connection
 
 from playtime import Playtime
 
 
-@pytest.fixture(scope="session")
-def playtime(tmpdir_factory, movies):
-    """Fixture to return an updated Playtime instance and Path for moviedirs."""
-    cachedir = Path(tmpdir_factory.mktemp("cache"))
-    pt = Playtime(cache_directory=cachedir)
-    pt.update_cache(
-        new_basedirs=[movies / "movies1", movies / "movies2"],
+@dataclass(frozen=True, slots=True)
+class PlaytimeFixture:
+    """The value of the playtime fixture."""
+
+    pt: Playtime
+    movies: Path
+
+
+def build_playtime(tmp_path_factory):
+    """Create moviedirs and return a PlaytimeFixture with a Playtime instance which has identified the moviedirs."""
+    create_test_database(tmp_path_factory)
+    movies = clone_movies(tmp_path_factory, create_movies_template(tmp_path_factory))
+    pt = Playtime(cache_directory=tmp_path_factory.mktemp("cache"))
+    pt.identify_directories(
+        directories=[movies / path for path in MOVIE_DIRS],
+        persist=False,
+        force=False,
+        ignore_textfiles=False,
+        accept_languages=[],
     )
-    return pt, movies
+    return PlaytimeFixture(pt=pt, movies=movies)
+
 
+def create_test_database(tmp_path_factory):
+    """Switch the database from ~/.cache/playtime/playtime.db to a new one, with the TITLES and a title search index."""
+    # django_imdb can only be imported once playtime has set up Django
+    from django_imdb.models import Aka, Title, TitleType  # noqa: PLC0415
+    from django_imdb.pocketsearch import reindex_pocketsearch  # noqa: PLC0415
 
-def create_moviedirs(basedir, movies):
-    """Recursive thing to create directories and files from a dict."""
-    for pathname, contents in movies.items():
-        path = Path(basedir, pathname)
-        if isinstance(contents, dict):
-            path.mkdir()
-            # call recursively to create directory with contents
-            create_moviedirs(basedir=path, movies=contents)
-        elif isinstance(contents, str):
-            # write a file
-            with path.open("w") as f:
-                f.write(contents)
+    connection.close()
+    connection.settings_dict["NAME"] = str(tmp_path_factory.mktemp("db") / "playtime.db")
+    call_command("migrate", verbosity=0)
+    movie = TitleType.objects.create(name="movie")
+    for title_id, name, premiered, genres in TITLES:
+        title = Title.objects.create(
+            title_id=title_id,
+            title_type=movie,
+            primary_title=name,
+            original_title=name,
+            premiered=premiered,
+            genres=genres,
+        )
+        Aka.objects.create(title=title, ordering=1, aka=name, is_original_title=True)
+    reindex_pocketsearch(types=["movie"])
 
 
 @pytest.fixture(scope="session")
-def movies(tmpdir_factory):
-    """Return moviedir test data."""
-    moviedir = Path(tmpdir_factory.mktemp("movies"))
-    movies = {
-        "movies1": {
-            "commando": {},
-        },
-        "movies2": {
-            "commando.1985": {},
-            "jackass4": {
-                "imdb.txt": "https://www.imdb.com/title/tt11466222/",
-            },
-        },
-    }
-    create_moviedirs(moviedir, movies)
+def playtime(tmp_path_factory):
+    """Fixture to return a PlaytimeFixture with an updated Playtime instance and Path for moviedirs."""
+    return build_playtime(tmp_path_factory)
+
+
+# the moviedir test data, parent directories are created as needed so only leaf directories are listed
+MOVIE_DIRS = (
+    "movies1/commando",
+    "movies2/commando.1985",
+    "movies2/jackass4",
+)
+MOVIE_FILES = {
+    "movies2/jackass4/imdb.txt": b"https://www.imdb.com/title/tt11466222/",
+}
+# the IMDB titles in the moviedir test data, created in the test database instead of importing the IMDB datasets
+TITLES = (
+    ("tt0088944", "Commando", 1985, "Action,Adventure,Thriller"),
+    ("tt11466222", "Jackass Forever", 2022, "Action,Comedy,Documentary"),
+)
+
+
+def create_movies_template(tmp_path_factory):
+    """Build the moviedir test data in a template dir, to be cloned by clone_movies()."""
+    templatedir = tmp_path_factory.mktemp("movies_template")
+    for path in MOVIE_DIRS:
+        (templatedir / path).mkdir(parents=True, exist_ok=True)
+    for path, contents in MOVIE_FILES.items():
+        (templatedir / path).write_bytes(contents)
+    return templatedir
+
+
+def clone_movies(tmp_path_factory, templatedir):
+    """Return a fresh moviedir cloned from the template dir."""
+    moviedir = tmp_path_factory.mktemp("movies")
+    shutil.copytree(templatedir, moviedir, dirs_exist_ok=True, copy_function=shutil.copy)
     return moviedir
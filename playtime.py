@@ -14,66 +14,78 @@ More info at https://github.com/tykling/playtime
 from __future__ import annotations
 
 import argparse
+import atexit
+import contextlib
+import datetime
+import functools
 import hashlib
+import http.client
 import logging
+import logging.handlers
 import os
+import queue
 import re
 import shutil
 import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
-from typing import TYPE_CHECKING, TypeAlias
+from typing import TYPE_CHECKING, NoReturn, TypeAlias
+from urllib.request import Request, urlopen
 
 import django_stubs_ext
-import iso639
 import PTN  # type: ignore[import-untyped]
-from cinemagoerng import web as imdb
-from cinemagoerng.model import (
-    Movie,
-    MusicVideo,
-    ShortMovie,
-    TVEpisode,
-    TVMiniSeries,
-    TVMovie,
-    TVSeries,
-    TVShortMovie,
-    TVSpecial,
-    VideoGame,
-    VideoMovie,
-)
 from django.db import models
 from django.utils import timezone
-from enrich.logging import RichHandler
 from nanodjango import Django, defer  # type: ignore[import-untyped]
-from rich_argparse import RichHelpFormatter
+from rich.markup import MarkupError, escape, render
 
 with defer:
     from django_imdb.export_tsv import export_tsv_files
     from django_imdb.import_tsv import import_tsv_files
-    from django_imdb.models import Title
+    from django_imdb.models import Crew, Title
     from django_imdb.pocketsearch import pocketsearch_normalise, title_search
-    from django_imdb.utils import download_file
 
+# modules only needed by some commands are imported where they are used to keep startup fast,
+# the cinemagoerng models are only needed for type annotations
 if TYPE_CHECKING:
-    import datetime
+    from collections.abc import Callable
+
+    from cinemagoerng.model import (
+        Movie,
+        MusicVideo,
+        ShortMovie,
+        TVEpisode,
+        TVMiniSeries,
+        TVMovie,
+        TVSeries,
+        TVShortMovie,
+        TVSpecial,
+        VideoGame,
+        VideoMovie,
+    )
+
+    CgngObj: TypeAlias = (
+        Movie
+        | TVMovie
+        | ShortMovie
+        | TVShortMovie
+        | VideoMovie
+        | MusicVideo
+        | VideoGame
+        | TVSeries
+        | TVMiniSeries
+        | TVEpisode
+        | TVSpecial
+    )
 
 logger = logging.getLogger("playtime")
 
 django_stubs_ext.monkeypatch()
 
-CgngObj: TypeAlias = (
-    Movie
-    | TVMovie
-    | ShortMovie
-    | TVShortMovie
-    | VideoMovie
-    | MusicVideo
-    | VideoGame
-    | TVSeries
-    | TVMiniSeries
-    | TVEpisode
-    | TVSpecial
-)
 
 # get version number from package metadata if possible
 try:
@@ -87,7 +99,53 @@ except PackageNotFoundError:  # pragma: no cover
         __version__: str = "0.0.0"  # type: ignore[no-redef]
 
 MiB = 1024 * 1024
-IMDB_ID_REGEX = "(tt[0-9]{7,10}+)"
+# covers are streamed to disk in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# seconds to wait for the image host before giving up on a cover download
+DOWNLOAD_TIMEOUT_SECONDS = 30
+# IMDB ids are pure ASCII, so textfiles are searched as bytes without decoding them
+IMDB_ID_REGEX = re.compile(rb"(tt[0-9]{7,10})")
+# the CGNG data keys to save in CGNGData objects
+CGNG_KEYS = ("bottom_ranking", "top_ranking", "country_codes", "language_codes", "primary_image")
+CGNG_MAX_AGE_SECONDS = 86400 * 14
+# max number of parallel online IMDB lookups and cover downloads
+CGNG_LOOKUP_WORKERS = 8
+COVER_DOWNLOAD_WORKERS = 8
+# max number of parallel directory scans for textfiles with IMDB ids
+TEXTFILE_SCAN_WORKERS = 16
+# max number of parallel subdirs being symlinked
+SYMLINK_WORKERS = 8
+# old category dirs are renamed to .<category>.old.<pid>.<ns> in the symlink dir before they are deleted
+OLD_CATEGORY_DIR_REGEX = re.compile(r"\..+\.old\.[0-9]+\.[0-9]+")
+# max number of rows or values in a single database query, SQLite limits the number of query variables
+DB_BATCH_SIZE = 500
+# the categories enabled by default in 'playtime symlink'
+SYMLINK_CATEGORIES = (
+    "genres",
+    "years",
+    "directors",
+    "producers",
+    "writers",
+    "composers",
+    "actors",
+    "selfs",
+    "runtime",
+    "rating",
+    "top_ranking",
+    "bottom_ranking",
+    "language",
+    "languages",
+    "unidentified",
+    "duplicates",
+)
+# the IMDB datasets which can be skipped when importing or exporting
+IMDB_DATASETS = ("name.basics", "title.basics", "title.akas", "title.principals", "title.episodes", "title.ratings")
+# the parsed arguments passed on to import_tsv_files() and export_tsv_files()
+SKIP_DATASET_ARGS = frozenset(f"skip_{dataset.replace('.', '_')}" for dataset in IMDB_DATASETS)
+IMPORT_ARGS = SKIP_DATASET_ARGS | {"download_dir", "download_host", "max_tsv_age_seconds"}
+EXPORT_ARGS = SKIP_DATASET_ARGS | {"export_dir"}
+# set to 1 or 0 to enable or disable rich log output, by default rich log output is only used on a terminal
+PRETTY_LOGS_ENV = "PLAYTIME_PRETTY_LOGS"
 
 app = Django(
     SQLITE_DATABASE=Path("~/.cache/playtime/playtime.db").expanduser(),
@@ -149,6 +207,13 @@ class Playtime:
         self.cache_directory = cache_directory.expanduser()
         self.cover_directory = self.cache_directory / "covers"
         self.cover_directory.mkdir(exist_ok=True, parents=True)
+        # online IMDB lookups done in this run (including failed ones) by (title_id, language)
+        self.cgng_lookups: dict[tuple[str, str], CgngObj | None] = {}
+        # local title searches by (normalised title, year) and Titles by IMDB id, done in this run
+        self.title_searches: dict[tuple[str, int | None], str | None] = {}
+        self.titles: dict[str, Title] = {}
+        # paths relative to symlink dirs, by (symlink dir, path)
+        self.symlink_dir_relpaths: dict[tuple[str, str], str] = {}
         logger.debug(
             f":rocket: Initialising Playtime version [cyan]{__version__}[/cyan] with cachedir {cache_directory} ..."
         )
@@ -156,55 +221,81 @@ class Playtime:
     #### IDENTIFICATION #####
 
     def find_textfiles(self, moviedir: Path, extensions: list[str] | None = None) -> list[Path]:
-        """Glob and return a list of textfiles in the directory."""
+        """Find and return a list of textfiles in the directory, extensions are matched case-insensitively."""
         if not extensions:
             # use default list of extensions
             extensions = ["txt", "nfo"]
-        # use glob to find textfiles
-        textfiles: list[Path] = []
-        for ext in extensions:
-            for textfile in moviedir.glob(f"*.{ext}"):
+        # use a single scandir pass to find textfiles, the DirEntry objects cache the file type from the listing
+        textfiles: dict[str, list[Path]] = {ext.lower(): [] for ext in extensions}
+        try:
+            entries = os.scandir(moviedir)
+        except (FileNotFoundError, NotADirectoryError):
+            logger.debug(f"Not a directory [cyan]{moviedir}[/cyan]")
+            return []
+        except OSError as e:
+            logger.warning(f"Unable to list directory [cyan]{moviedir}[/cyan]: {e}")
+            return []
+        with entries:
+            for entry in entries:
+                _, dot, ext = entry.name.rpartition(".")
+                ext = ext.lower()
+                if not dot or ext not in textfiles:
+                    continue
+                textfile = Path(entry.path)
                 # skip directories and other non-files
-                if not textfile.is_file():
-                    logger.warning(f"Skipping non-file [cyan]{moviedir}[/cyan]")
+                if not entry.is_file():
+                    logger.warning(f"Skipping non-file [cyan]{textfile}[/cyan]")
                     continue
                 # skip big files
-                if textfile.stat().st_size > MiB:
-                    logger.warning(f"Skipping big textfile [cyan]{moviedir}[/cyan]")
+                if entry.stat().st_size > MiB:
+                    logger.warning(f"Skipping big textfile [cyan]{textfile}[/cyan]")
                     continue
                 logger.debug(f"Checking file [cyan]{textfile}[/cyan] for IMDB id...")
-                textfiles.append(textfile)
-        return textfiles
+                textfiles[ext].append(textfile)
+        # return textfiles in the order of the extensions
+        return [textfile for textfiles_for_ext in textfiles.values() for textfile in textfiles_for_ext]
 
     def find_imdb_id_in_textfiles(self, textfiles: list[Path]) -> str | None:
         """Search list of textfiles for an IMDB id, return the first found."""
         # loop over textfiles
         for textfile in textfiles:
-            if not textfile.exists():
-                continue
-            # open files as bytes, their encoding is unknown
-            with textfile.open("rb") as f:
-                text = f.read()
-            try:
-                matches = re.findall(IMDB_ID_REGEX, text.decode("utf-8"))
-            except UnicodeDecodeError:
-                matches = re.findall(IMDB_ID_REGEX, text.decode("iso-8859-1"))
-            if matches:
-                logger.debug(f"Found IMDB id [cyan]{matches[0]}[/cyan] in file [cyan]{textfile}[/cyan]")
-                return str(matches[0])
+            imdb_id = self.search_imdb_id_in_textfile(textfile=textfile)
+            if imdb_id:
+                logger.debug(f"Found IMDB id [cyan]{imdb_id}[/cyan] in file [cyan]{textfile}[/cyan]")
+                return imdb_id
         # no luck :(
         logger.debug("No IMDB id found in any textfiles")
         return None
 
+    def search_imdb_id_in_textfile(self, textfile: Path) -> str | None:
+        """Return the first IMDB id in a textfile."""
+        try:
+            # read files as bytes, their encoding is unknown
+            contents = textfile.read_bytes()
+        except FileNotFoundError:
+            return None
+        match = IMDB_ID_REGEX.search(contents)
+        return match.group(1).decode("ascii") if match else None
+
     def local_title_search(self, title: str, year: int | None) -> Title | None:
         """Search the local datbase for the title and optionally restrict to year."""
         title = pocketsearch_normalise(title)
-        logger.debug(f"Searching for title '{title}' and year {year}")
-        results = title_search(title=title, year=year)
-        if not results:
+        # each search is done at most once per run, many directories can hold the same title
+        if (title, year) not in self.title_searches:
+            logger.debug(f"Searching for title '{title}' and year {year}")
+            results = title_search(title=title, year=year)
+            self.title_searches[(title, year)] = results[0] if results else None
+        title_id = self.title_searches[(title, year)]
+        if title_id is None:
             logger.debug(f"No results found in local database searching for title {title} year {year}")
             return None
-        return Title.objects.get(title_id=results[0])
+        return self.get_title(title_id=title_id)
+
+    def get_title(self, title_id: str) -> Title:
+        """Return the Title with this IMDB id, getting each Title from the database at most once per run."""
+        if title_id not in self.titles:
+            self.titles[title_id] = Title.objects.get(title_id=title_id)
+        return self.titles[title_id]
 
     def identify_directories(
         self,
@@ -216,27 +307,41 @@ class Playtime:
         accept_languages: list[str],
     ) -> None:
         """Identify titles in directories."""
-        for relpath in directories:
-            # resolve relative dirs
-            path = relpath.resolve()
+        # resolve relative dirs
+        paths = [relpath.resolve() for relpath in directories]
+        existing_directories = self.get_directories(paths=paths)
+        textfile_imdb_ids = (
+            {}
+            if ignore_textfiles
+            else self.scan_textfiles(directories=paths, force=force, existing_directories=existing_directories)
+        )
+
+        new_directories: list[Directory] = []
+        # (directory, title, language) for each identified directory
+        identified: list[tuple[Path, Title, str]] = []
+        for path in paths:
             if not path.exists():
                 logger.warning(f":cross_mark: {path} - Directory does not exist - skipping")
                 continue
 
             # identify directory
-            title, source = self.identify_directory(directory=path, ignore_textfiles=ignore_textfiles, force=force)
+            title, source = self.identify_directory(
+                directory=path,
+                ignore_textfiles=ignore_textfiles,
+                force=force,
+                textfile_imdb_ids=textfile_imdb_ids,
+                existing_directories=existing_directories,
+            )
             if title:
                 logger.info(f"{path} - {title} ({source})")
             else:
                 logger.warning(f":cross_mark: {path} - Unable to identify title.")
 
-            # persist directory in database
-            directory, _ = Directory.objects.get_or_create(
-                path=path,
-                defaults={
-                    "title": title,
-                },
-            )
+            # persist directory in database, new directories are created in bulk below
+            directory = existing_directories.get(str(path))
+            if directory is None:
+                directory = Directory(path=str(path), title=title)
+                new_directories.append(directory)
 
             # the rest requires a Title
             if not title:
@@ -246,56 +351,181 @@ class Playtime:
             if persist:
                 directory.write_imdb_url()
 
-            # get extra metadata in suitable language
+            # find extra metadata in suitable language, existing metadata is fetched and missing looked up below
             language = self.get_title_language(title=title, accept_languages=accept_languages)
-            cgng = self.get_cgng_data(title=title, language=language)
+            identified.append((path, title, language))
+
+        Directory.objects.bulk_create(new_directories, batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+
+        # get existing extra metadata in bulk, and missing extra metadata in parallel, each title and language only once
+        existing = self.get_existing_cgng_datas(title_ids={title.title_id for _, title, _ in identified})
+        lookups = {
+            (title.title_id, language): title
+            for _, title, language in identified
+            if (title.title_id, language) not in existing
+        }
+        looked_up = self.lookup_cgng_data(lookups=[(title, language) for (_, language), title in lookups.items()])
+
+        # (directory, title, language, coverpath, cover url) for each identified directory with extra metadata
+        covers: list[tuple[Path, Title, str, Path, str | None]] = []
+        for path, title, language in identified:
+            cgng = existing.get((title.title_id, language)) or looked_up.get((title.title_id, language))
             if cgng is None:
                 continue
-
-            # download cover?
+            # remember the cover for downloading and copying below
             coversrc = self.get_coverpath(title=title, lang=language)
-            url = cgng.data["primary_image"]
-            if not coversrc.exists() and url is not None:
-                logger.debug(f"Downloading cover for {title} in language {language} to path {coversrc}")
-                download_file(url=url, path=coversrc)
-            if not coversrc.exists():
+            covers.append((path, title, language, coversrc, cgng.data["primary_image"]))
+        self.update_directory_covers(covers=covers)
+
+    def get_directories(self, paths: list[Path]) -> dict[str, Directory]:
+        """Return the existing Directory objects for the paths, by path."""
+        strpaths = [str(path) for path in paths]
+        directories: dict[str, Directory] = {}
+        for start in range(0, len(strpaths), DB_BATCH_SIZE):
+            batch = Directory.objects.filter(path__in=strpaths[start : start + DB_BATCH_SIZE]).select_related("title")
+            directories.update((directory.path, directory) for directory in batch)
+        return directories
+
+    def update_directory_covers(self, covers: list[tuple[Path, Title, str, Path, str | None]]) -> None:
+        """Download missing covers and copy them to the directories.
+
+        Covers are (directory, title, language, coverpath, cover url) tuples.
+        """
+        # check each cover in the cache only once, many directories can share the same cover
+        urls = {coversrc: url for _, _, _, coversrc, url in covers}
+        available = {coversrc for coversrc in urls if coversrc.exists()}
+        # download missing covers in parallel, each cover only once
+        downloads = {coversrc: url for coversrc, url in urls.items() if url is not None and coversrc not in available}
+        with ThreadPoolExecutor(max_workers=COVER_DOWNLOAD_WORKERS) as executor:
+            # failed downloads are logged and skipped by download_cover, so one bad url does not stop the rest
+            results = executor.map(self.download_cover, downloads.values(), downloads.keys())
+            available.update(coversrc for coversrc, ok in zip(downloads, results, strict=True) if ok)
+
+        # hashes of the covers in the cache, computed when first needed
+        hashes: dict[Path, str] = {}
+        for path, title, language, coversrc, _ in covers:
+            if coversrc not in available:
                 logger.warning(f"Unable to download cover for {title} in language {language} to path {coversrc}")
                 continue
 
-            # copy cover to directory?
+            # copy cover to directory? other tools may modify poster.jpg in place, so it is never a hardlink
             coverdst = path / "poster.jpg"
-            if coverdst.exists() and self.file_hash(coversrc) == self.file_hash(coverdst):
-                # files are the same, no need to copy again
-                continue
+            if coverdst.exists():
+                if coversrc not in hashes:
+                    hashes[coversrc] = self.file_hash(coversrc)
+                if hashes[coversrc] == self.file_hash(coverdst):
+                    # files are the same, no need to copy again
+                    continue
             # cover is missing or changed, copy it over
             logger.debug(f"Copying cover for {title} in language {language} from path {coversrc} to {coverdst}")
             shutil.copy(coversrc, coverdst)
 
+    def link_or_copy(self, src: Path, dst: Path) -> None:
+        """Hardlink src to dst, or copy it when hardlinking is not possible.
+
+        Only use this for files in the cache and symlink dirs, which are owned by playtime and never modified in place.
+        """
+        try:
+            os.link(src, dst)
+        except OSError:
+            # different filesystems or no hardlink support, copy to a temporary file and rename it,
+            # so an interrupted copy never leaves a partial file
+            partpath = dst.with_suffix(".part")
+            try:
+                shutil.copy(src, partpath)
+                partpath.replace(dst)
+            finally:
+                partpath.unlink(missing_ok=True)
+
+    def scan_textfiles(
+        self, *, directories: list[Path], force: bool, existing_directories: dict[str, Directory]
+    ) -> dict[Path, str | None]:
+        """Find IMDB ids in textfiles in parallel, skipping directories already identified in the local database.
+
+        existing_directories is the get_directories() result for the directories.
+        """
+        known: set[str] = set()
+        if not force:
+            known = {path for path, directory in existing_directories.items() if directory.title_id is not None}
+        scan = [path for path in directories if str(path) not in known and path.is_dir()]
+        if not scan:
+            return {}
+        # the scans are bound by filesystem syscalls which release the GIL
+        with ThreadPoolExecutor(max_workers=min(TEXTFILE_SCAN_WORKERS, len(scan))) as executor:
+            return dict(zip(scan, executor.map(self.find_imdb_id_in_directory, scan), strict=True))
+
+    def find_imdb_id_in_directory(self, directory: Path) -> str | None:
+        """Return the first IMDB id found in textfiles in the directory."""
+        return self.find_imdb_id_in_textfiles(textfiles=self.find_textfiles(moviedir=directory))
+
+    def get_textfile_imdb_id(
+        self, directory: Path, textfile_imdb_ids: dict[Path, str | None] | None = None
+    ) -> str | None:
+        """Return the IMDB id from textfiles in the directory, using the scan_textfiles() result when available."""
+        if textfile_imdb_ids is not None and directory in textfile_imdb_ids:
+            return textfile_imdb_ids[directory]
+        return self.find_imdb_id_in_directory(directory)
+
+    def download_cover(self, url: str, coverpath: Path) -> bool:
+        """Download a cover to the cover directory, return True if the download succeeded."""
+        logger.debug(f"Downloading cover from {url} to path {coverpath}")
+        # stream the cover to a temporary file and rename it, so a failed download never leaves a partial cover
+        partpath = coverpath.with_suffix(".part")
+        request = Request(url, headers={"User-Agent": f"playtime/{__version__}"})  # noqa: S310
+        try:
+            with urlopen(request, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response, partpath.open("wb") as f:  # noqa: S310
+                shutil.copyfileobj(response, f, length=DOWNLOAD_CHUNK_SIZE)
+                # reading in chunks does not raise when the server closes the connection before the whole body is sent
+                missing = getattr(response, "length", None)
+                if missing:
+                    raise http.client.IncompleteRead(b"", missing)
+            partpath.replace(coverpath)
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            logger.warning(f"Unable to download cover from {url}: {e}")
+            return False
+        finally:
+            # the temporary file is gone after a successful rename
+            partpath.unlink(missing_ok=True)
+        return True
+
+    def get_identified_directory(
+        self, directory: Path, existing_directories: dict[str, Directory] | None = None
+    ) -> Directory | None:
+        """Return the Directory for the path if it has a Title, using the get_directories() result when available."""
+        if existing_directories is None:
+            return Directory.objects.filter(path=str(directory), title__isnull=False).select_related("title").first()
+        dbdir = existing_directories.get(str(directory))
+        return dbdir if dbdir is not None and dbdir.title_id is not None else None
+
     def identify_directory(
         self,
         *,
         directory: Path,
         ignore_textfiles: bool = False,
         force: bool = False,
+        textfile_imdb_ids: dict[Path, str | None] | None = None,
+        existing_directories: dict[str, Directory] | None = None,
     ) -> tuple[Title, str] | tuple[None, None]:
-        """Attempt to identify content in directory, create and return a Directory object."""
+        """Attempt to identify content in directory, return the Title and source. Does not persist anything.
+
+        Directories in textfile_imdb_ids have already been scanned for IMDB ids by scan_textfiles(),
+        and existing_directories is the get_directories() result when identifying many directories.
+        """
         if not force:
             # not forcing identification, try local database first
-            try:
-                dbdir = Directory.objects.get(path=str(directory), title__isnull=False)
+            dbdir = self.get_identified_directory(directory=directory, existing_directories=existing_directories)
+            if dbdir is not None:
                 logger.debug(f"{directory} - known in local database, returning title {dbdir.title}")
-            except Directory.DoesNotExist:
-                logger.debug(f"{directory} - not known in local database, identifying...")
-            else:
                 return dbdir.title, "directory known in local database"
+            logger.debug(f"{directory} - not known in local database, identifying...")
 
         if not ignore_textfiles:
             logger.debug(f"{directory} - trying to find IMDB id in textfile...")
-            textfile_imdb_id = self.find_imdb_id_in_textfiles(textfiles=self.find_textfiles(moviedir=directory))
+            textfile_imdb_id = self.get_textfile_imdb_id(directory=directory, textfile_imdb_ids=textfile_imdb_ids)
             if textfile_imdb_id:
                 logger.debug(f"{directory} - Found IMDB ID [cyan]{textfile_imdb_id}[/cyan] in textfile")
                 try:
-                    return Title.objects.get(title_id=textfile_imdb_id), "directory identified from textfile"
+                    return self.get_title(title_id=textfile_imdb_id), "directory identified from textfile"
                 except Title.DoesNotExist:
                     logger.debug(
                         f"{directory} - IMDB ID from textfile '{textfile_imdb_id}' did not return a Title from database"
@@ -324,12 +554,6 @@ class Playtime:
             # try without year
             dbtitle = self.local_title_search(title=title, year=None)
         if dbtitle:
-            Directory.objects.get_or_create(
-                path=directory,
-                defaults={
-                    "title": dbtitle,
-                },
-            )
             return dbtitle, "title identified from directory name"
         logger.debug(f"Local database search for '{title}' from year '{year}' did not return anything useful")
         return None, None
@@ -341,33 +565,76 @@ class Playtime:
 
     def update_extra_metadata(self, accept_languages: list[str]) -> None:
         """Update metadata (if needed) for all Directory titles."""
+        # find all fresh data with one query and one timestamp rather than per title
+        cutoff = timezone.now() - datetime.timedelta(seconds=CGNG_MAX_AGE_SECONDS)
+        fresh = set(CGNGData.objects.filter(updated_at__gte=cutoff).values_list("title_id", "language"))
+        lookups: list[tuple[Title, str]] = []
         for title in Title.objects.filter(directories__isnull=False).distinct():
             language = self.get_title_language(title=title, accept_languages=accept_languages)
-            self.get_cgng_data(title=title, language=language)
+            if (title.title_id, language) not in fresh:
+                lookups.append((title, language))
+        self.lookup_cgng_data(lookups=lookups)
+
+    def lookup_cgng_data(self, lookups: list[tuple[Title, str]]) -> dict[tuple[str, str], CGNGData | None]:
+        """Do online IMDB lookups for (title, language) pairs, save and return the CGNGData by (title_id, language)."""
+        results: dict[tuple[str, str], CGNGData | None] = {}
+        # the lookups are network bound so do them in parallel, but keep the database work in this thread
+        with ThreadPoolExecutor(max_workers=CGNG_LOOKUP_WORKERS) as executor:
+            futures = {
+                executor.submit(self.cgng_lookup, title=title, language=language): (title, language)
+                for title, language in lookups
+            }
+            for future in as_completed(futures):
+                title, language = futures[future]
+                results[(title.title_id, language)] = self.save_cgng_data(
+                    title=title, language=language, data=future.result()
+                )
+        return results
 
     def get_cgng_data(
         self,
         title: Title,
         language: str = "en",
-        keys: tuple[str, ...] = ("bottom_ranking", "top_ranking", "country_codes", "language_codes", "primary_image"),
-        max_age_seconds: int = 86400 * 14,
+        keys: tuple[str, ...] = CGNG_KEYS,
+        max_age_seconds: int = CGNG_MAX_AGE_SECONDS,
     ) -> CGNGData | None:
         """Create or update a CGNGData object from IMDB id."""
-        # check for existing data
-        try:
-            existing = CGNGData.objects.get(title_id=title.title_id, language=language)
-            if (timezone.now() - existing.updated_at).seconds < max_age_seconds:
-                # no need to get new data
-                return existing
-        except CGNGData.DoesNotExist:
-            pass
-
+        existing = self.get_existing_cgng_data(title=title, language=language, max_age_seconds=max_age_seconds)
+        if existing is not None:
+            # no need to get new data
+            return existing
         data = self.cgng_lookup(title=title, language=language)
+        return self.save_cgng_data(title=title, language=language, data=data, keys=keys)
+
+    def get_existing_cgng_data(
+        self, title: Title, language: str, max_age_seconds: int = CGNG_MAX_AGE_SECONDS
+    ) -> CGNGData | None:
+        """Return the existing CGNGData object for this title and language, if it is not too old."""
+        cutoff = timezone.now() - datetime.timedelta(seconds=max_age_seconds)
+        return CGNGData.objects.filter(title_id=title.title_id, language=language, updated_at__gte=cutoff).first()
+
+    def get_existing_cgng_datas(
+        self, title_ids: set[str], max_age_seconds: int = CGNG_MAX_AGE_SECONDS
+    ) -> dict[tuple[str, str], CGNGData]:
+        """Return the existing CGNGData objects for these titles which are not too old, by (title_id, language)."""
+        cutoff = timezone.now() - datetime.timedelta(seconds=max_age_seconds)
+        strids = sorted(title_ids)
+        cgngdatas: dict[tuple[str, str], CGNGData] = {}
+        for start in range(0, len(strids), DB_BATCH_SIZE):
+            batch = CGNGData.objects.filter(title_id__in=strids[start : start + DB_BATCH_SIZE], updated_at__gte=cutoff)
+            cgngdatas.update(((cgng.title_id, cgng.language), cgng) for cgng in batch)
+        return cgngdatas
+
+    def save_cgng_data(
+        self, title: Title, language: str, data: CgngObj | None, keys: tuple[str, ...] = CGNG_KEYS
+    ) -> CGNGData | None:
+        """Save the requested keys from the CGNG lookup data in a CGNGData object."""
         if data is None:
             return None
 
-        # create a dict of requested keys
-        modeldata = {k: v for k, v in data.__dict__.items() if k in keys}
+        # create a dict of requested keys, looking up only those instead of walking all attributes
+        attrs = vars(data)
+        modeldata = {k: attrs[k] for k in keys if k in attrs}
         # save in database
         cgng, created = CGNGData.objects.update_or_create(
             title_id=title.title_id, language=language, defaults={"data": modeldata}
@@ -383,56 +650,115 @@ class Playtime:
         title: Title,
         language: str,
     ) -> CgngObj | None:
-        """Do online IMDB lookup and return the data."""
+        """Do online IMDB lookup and return the data, at most once per title and language in each run."""
+        key = (title.title_id, language)
+        if key in self.cgng_lookups:
+            return self.cgng_lookups[key]
+        from cinemagoerng import web as imdb  # noqa: PLC0415
+
         try:
-            return imdb.get_title(title.title_id, accept_language=language)
+            data = imdb.get_title(title.title_id, accept_language=language)
         except Exception:
             logger.exception(f":cross_mark: Unable to lookup title {title} using cinemagoerng, skipping")
-            return None
+            data = None
+        self.cgng_lookups[key] = data
+        return data
 
     #### SYMLINKS #####
 
-    def clean_category_dir(self, category_dir: Path) -> None:
-        """Clean any old directories and symlinks from the category_dir."""
+    def clean_category_dir(self, category_dir: Path, cleanup: list[threading.Thread] | None = None) -> None:
+        """Clean any old directories and symlinks from the category_dir.
+
+        If a cleanup list is given the old category_dir is renamed out of the way and deleted in a
+        background thread, which is added to the list so the caller can join it.
+        """
         if category_dir.exists():
             # the clean-slate protocol, sir?
-            shutil.rmtree(category_dir)
+            if cleanup is None:
+                shutil.rmtree(category_dir)
+            else:
+                olddir = category_dir.with_name(f".{category_dir.name}.old.{os.getpid()}.{time.monotonic_ns()}")
+                category_dir.rename(olddir)
+                self.remove_old_category_dir(olddir=olddir, cleanup=cleanup)
         # make sure the category dir exists
         category_dir.mkdir(parents=True)
 
-    def get_category_things(self, title: Title, category: str) -> list[str]:
-        """Return symlink things for a Title and category."""
+    def remove_old_category_dir(self, olddir: Path, cleanup: list[threading.Thread]) -> None:
+        """Delete a renamed old category dir in a background thread, which is added to the cleanup list."""
+
+        def remove() -> None:
+            try:
+                shutil.rmtree(olddir)
+            except OSError as e:
+                logger.warning(f"Unable to delete old category dir {olddir}: {e}")
+
+        thread = threading.Thread(target=remove)
+        thread.start()
+        cleanup.append(thread)
+
+    def remove_stale_category_dirs(self, symlink_dir: Path, cleanup: list[threading.Thread]) -> None:
+        """Delete old category dirs left in the symlink dir by earlier runs which did not finish deleting them."""
+        with os.scandir(symlink_dir) as entries:
+            stale = [
+                Path(entry.path)
+                for entry in entries
+                if OLD_CATEGORY_DIR_REGEX.fullmatch(entry.name) and entry.is_dir(follow_symlinks=False)
+            ]
+        for olddir in stale:
+            logger.debug(f"Deleting stale old category dir {olddir}")
+            self.remove_old_category_dir(olddir=olddir, cleanup=cleanup)
+
+    def get_category_things(self, title: Title, category: str, crew: dict[str, list[str]] | None = None) -> list[str]:
+        """Return symlink things for a Title and category, crew is from get_crew_by_category() if given."""
         if category == "genres":
             things = title.genrelist
         elif category == "years":
             things = title.yearlist
-        elif category in ["directors", "producers", "writers", "composers", "selfs"]:
-            persons = title.crewmembers.filter(category=category[:-1]).values_list("person__name", flat=True)  # type: ignore[attr-defined]
-            things = list(persons)
-        elif category == "actors":
-            things = list(
-                title.crewmembers.filter(category__in=["actor", "actress"]).values_list("person__name", flat=True)  # type: ignore[attr-defined]
-            )
+        elif category in ["actors", "directors", "producers", "writers", "composers", "selfs"]:
+            if crew is None:
+                crew = self.get_crew_by_category(title=title)
+            things = crew.get(category, [])
         elif category == "runtime":
             things = [str(title.runtime_minutes // 30)] if title.runtime_minutes else []
         elif category == "rating":
             things = [title.rating.rating] if hasattr(title, "rating") else []
         elif category in ["top_ranking", "bottom_ranking"]:
-            things = [title.cgngdata.first().data[category]] if title.cgngdata.exists() else []  # type: ignore[attr-defined]
+            cgngdata = self.get_any_cgngdata(title=title)
+            things = [cgngdata.data[category]] if cgngdata else []
         elif category == "language":
-            things = (
-                [self.iso639_code_to_name(code) for code in title.cgngdata.first().data["language_codes"]]  # type: ignore[attr-defined]
-                if title.cgngdata.exists()  # type: ignore[attr-defined]
-                else []
-            )
+            cgngdata = self.get_any_cgngdata(title=title)
+            things = [self.iso639_code_to_name(code) for code in cgngdata.data["language_codes"]] if cgngdata else []
         elif category == "languages":
-            things = [",".join(title.cgngdata.first().data["language_codes"])] if title.cgngdata.exists() else []  # type: ignore[attr-defined]
+            cgngdata = self.get_any_cgngdata(title=title)
+            things = [",".join(cgngdata.data["language_codes"])] if cgngdata else []
         else:
             things = []
         return [x for x in things if x is not None and x != ""]
 
+    def build_category_index(self, *, titles: list[Title], categories: list[str]) -> dict[str, dict[str, list[str]]]:
+        """Return the symlink things for each of the titles in each category, by title_id and category."""
+        index: dict[str, dict[str, list[str]]] = {}
+        for title in titles:
+            # group the crew once per title rather than once per person category
+            crew = self.get_crew_by_category(title=title)
+            index[title.title_id] = {
+                category: self.get_category_things(title=title, category=category, crew=crew) for category in categories
+            }
+        return index
+
+    def get_crew_by_category(self, title: Title) -> dict[str, list[str]]:
+        """Return the names of the crew of a Title by symlink category, like {"actors": [...], "directors": [...]}."""
+        crew: dict[str, list[str]] = defaultdict(list)
+        # iterate in python so prefetched crewmembers are used
+        for member in title.crewmembers.all():  # type: ignore[attr-defined]
+            category = "actors" if member.category_id in ["actor", "actress"] else f"{member.category_id}s"
+            crew[category].append(member.person.name)
+        return crew
+
     def iso639_code_to_name(self, code: str) -> str:
         """Translate an iso639 language code like 'da' to 'Danish'."""
+        import iso639  # noqa: PLC0415
+
         try:
             return f"{iso639.Language.match(code).name} ({code})"
         except iso639.language.LanguageNotFoundError:
@@ -451,72 +777,148 @@ class Playtime:
         # create .titles dir for covers and metadata by title
         titles_dir = symlink_dir / ".titles"
         titles_dir.mkdir(exist_ok=True, parents=True)
+        # old category dirs are deleted in the background while the new ones are created,
+        # including any left behind by an earlier run which was interrupted
+        cleanup: list[threading.Thread] = []
+        self.remove_stale_category_dirs(symlink_dir=symlink_dir, cleanup=cleanup)
+        # get titles present in one or more directories, and their things in all categories, only once.
+        # Related data is fetched in a few queries up front, which also means the symlink workers below
+        # do not need database access.
+        titles = list(
+            Title.objects.filter(directories__isnull=False)
+            .distinct()
+            .select_related("rating")
+            .prefetch_related(
+                "directories",
+                "cgngdata",
+                models.Prefetch("crewmembers", queryset=Crew.objects.select_related("person")),
+            )
+        )
+        category_index = self.build_category_index(titles=titles, categories=categories)
+        # get title languages (for covers) and title dirnames
+        languages = {
+            title.title_id: self.get_title_language(title=title, accept_languages=accept_languages) for title in titles
+        }
+        dirnames = {
+            title.title_id: self.get_title_dirname(title=title, accept_languages=accept_languages) for title in titles
+        }
+        # copy covers to the symlink dir up front, so the symlink workers never copy the same cover at once
+        for title in titles:
+            self.copy_cover_to_symlink_dir(symlink_dir=symlink_dir, title=title, lang=languages[title.title_id])
         # loop over categories
         for category in categories:
             category_dir = symlink_dir / category
-            self.clean_category_dir(category_dir=category_dir)
+            self.clean_category_dir(category_dir=category_dir, cleanup=cleanup)
             logger.info(f"Creating {category} symlinks in {category_dir} with languages {accept_languages}...")
-            # loop over titles present in one or more directories
-            for title in Title.objects.filter(directories__isnull=False).distinct():
-                # /movies/playtime/.titles/tt6264654/
-                title_dir = titles_dir / title.title_id
-                # get title language (for cover)
-                lang = self.get_title_language(title=title, accept_languages=accept_languages)
-                things = self.get_category_things(title=title, category=category)
+            # the (title, lang) to symlink in each subdir
+            subdirs: dict[Path, list[tuple[Title, str]]] = defaultdict(list)
+            for title in titles:
+                lang = languages[title.title_id]
+                things = category_index[title.title_id][category]
                 if not things:
                     continue
                 logger.debug(f"Creating category {category} symlinks for {title} things: {things}")
                 # loop over things in this category for this title
-                # thing is Western, Drama, actor name, year and such
+                # thing is Western, Drama, actor name, year and such (never empty, see get_category_things)
                 for thing in things:
-                    if thing is None or thing == "":
-                        continue
                     subdir = self.get_category_subdir(
                         category_dir=category_dir,
                         category=category,
                         thing=thing,
                         title=title,
-                        accept_languages=accept_languages,
+                        dirname=dirnames[title.title_id],
                     )
                     logger.debug(f"Creating {category} symlinks for {thing} in subdir {subdir}")
-                    self.symlink_title_dirs(
-                        subdir=subdir, title=title, symlink_dir=symlink_dir, lang=lang, title_dir=title_dir
-                    )
+                    subdirs[subdir].append((title, lang))
+            self.symlink_subdirs(subdirs=subdirs, symlink_dir=symlink_dir)
         if "unidentified" in categories:
             self.symlink_unidentified_dirs(symlink_dir=symlink_dir)
         if "duplicates" in categories:
             self.symlink_duplicate_titles(symlink_dir=symlink_dir, lang=lang)
-        for title in Title.objects.filter(directories__isnull=False):
-            self.create_title_metadata_dir(title=title, symlink_dir=symlink_dir, categories=categories)
+        for title in titles:
+            self.create_title_metadata_dir(
+                title=title,
+                symlink_dir=symlink_dir,
+                categories=categories,
+                category_things=category_index[title.title_id],
+            )
         self.add_counts_to_dirnames(symlink_dir=symlink_dir, categories=categories)
+        for thread in cleanup:
+            thread.join()
         logger.debug("Done")
 
-    def symlink_title_dirs(self, subdir: Path, title: Title, symlink_dir: Path, lang: str, title_dir: Path) -> None:
-        """Create title subdir and symlink all copies of this title inside."""
+    def symlink_subdirs(self, subdirs: dict[Path, list[tuple[Title, str]]], symlink_dir: Path) -> None:
+        """Symlink the directories of the titles in each subdir, in parallel with one subdir per task."""
+        # the symlinking is bound by filesystem syscalls which release the GIL
+        with ThreadPoolExecutor(max_workers=SYMLINK_WORKERS) as executor:
+            futures = [
+                executor.submit(self.symlink_subdir, subdir=subdir, titles=titles, symlink_dir=symlink_dir)
+                for subdir, titles in subdirs.items()
+            ]
+            for future in futures:
+                # raise any exceptions from the workers
+                future.result()
+
+    def symlink_subdir(self, subdir: Path, titles: list[tuple[Title, str]], symlink_dir: Path) -> None:
+        """Symlink the directories of each (title, lang) in the subdir."""
+        # create the subdir only once, not for each title in it
         subdir.mkdir(exist_ok=True, parents=True)
+        # open the subdir once and create the symlinks relative to it, so the kernel
+        # does not have to resolve the full subdir path for every symlink
+        dir_fd = os.open(subdir, os.O_RDONLY | os.O_DIRECTORY) if os.symlink in os.supports_dir_fd else None
+        try:
+            for title, lang in titles:
+                # /movies/playtime/.titles/tt6264654/
+                title_dir = symlink_dir / ".titles" / title.title_id
+                self.symlink_title_dirs(
+                    subdir=subdir, title=title, symlink_dir=symlink_dir, lang=lang, title_dir=title_dir, dir_fd=dir_fd
+                )
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+    def symlink_title_dirs(  # noqa: PLR0913
+        self, subdir: Path, title: Title, symlink_dir: Path, lang: str, title_dir: Path, *, dir_fd: int | None = None
+    ) -> None:
+        """Symlink all copies of this title inside the title subdir, which must exist.
+
+        If dir_fd is an open file descriptor for the subdir the symlinks are created relative to it.
+        """
+        # relative link targets are made from the path relative to the symlink dir, which is computed only
+        # once per path, prefixed with a .. for each level the subdir is below the symlink dir
+        symlink_dir_str = str(symlink_dir)
+        updirs = os.sep.join([os.pardir] * len(subdir.relative_to(symlink_dir).parts))  # noqa: PTH118
         metapath = subdir / "metadata"
-        if metapath.exists():
-            metapath.unlink()
-        target = Path(os.path.relpath(title_dir, subdir))
+        target = os.path.join(updirs, self.get_symlink_dir_relpath(symlink_dir_str, str(title_dir)))  # noqa: PTH118
         logger.debug(f"Creating metadata symlink at {metapath} to {title_dir} relative {target}")
-        metapath.symlink_to(target)
+        self.replace_symlink(target=target, linkpath=metapath)
         logger.debug(f"Symlinking cover in subdir {subdir}")
         self.symlink_cover(cover_dest_dir=subdir, symlink_dir=symlink_dir, title=title, lang=lang)
-        # loop over copies of this title
+        # loop over copies of this title, using plain strings and os functions rather than pathlib in this hot loop
+        subdir_str = str(subdir)
         for directory in title.directories.all():  # type: ignore[attr-defined]
-            # the path of the symlink (not the link target)
-            linkpath = subdir / Path(directory.path).name
-            if linkpath.is_symlink():
+            # the name and path of the symlink (not the link target)
+            linkname = os.path.basename(directory.path)  # noqa: PTH119
+            linkpath = os.path.join(subdir_str, linkname)  # noqa: PTH118
+            target = os.path.join(updirs, self.get_symlink_dir_relpath(symlink_dir_str, directory.path))  # noqa: PTH118
+            # create symlink to this directory
+            logger.debug(f"Creating relative symlink at {linkpath} to {target}")
+            try:
+                if dir_fd is None:
+                    os.symlink(target, linkpath)  # noqa: PTH211
+                else:
+                    os.symlink(target, linkname, dir_fd=dir_fd)
+            except FileExistsError:
                 # The link to this movie already exists.
                 # This can happen when the same titledir name
                 # exists in multiple places, ignore and continue
                 continue
-            target = Path(os.path.relpath(directory.path, linkpath.parent))
-            # create symlink to this directory
-            logger.debug(f"Creating relative symlink at {linkpath} to {target}")
-            linkpath.symlink_to(target)
-            # also symlink cover
-            self.symlink_cover(cover_dest_dir=linkpath.parent, symlink_dir=symlink_dir, title=title, lang=lang)
+
+    def get_symlink_dir_relpath(self, symlink_dir: str, path: str) -> str:
+        """Return path relative to the symlink dir, computing it only once per symlink dir and path."""
+        if (symlink_dir, path) not in self.symlink_dir_relpaths:
+            self.symlink_dir_relpaths[(symlink_dir, path)] = os.path.relpath(path, symlink_dir)
+        return self.symlink_dir_relpaths[(symlink_dir, path)]
 
     def symlink_unidentified_dirs(self, symlink_dir: Path) -> None:
         """Create a dir with symlinks to all the unidentified titles."""
@@ -540,14 +942,19 @@ class Playtime:
         ):
             # /movies/playtime/.titles/tt6264654/
             title_dir = titles_dir / title.title_id
-            aka = self.get_title_aka(title=title, accept_languages=[lang])
-            aka = aka.replace(os.sep, "_")
-            dirname = f"{aka} ({title.premiered})"
-            subdir = duplicate_dir / dirname
+            subdir = duplicate_dir / self.get_title_dirname(title=title, accept_languages=[lang])
+            subdir.mkdir(exist_ok=True, parents=True)
             self.symlink_title_dirs(subdir=subdir, title=title, symlink_dir=symlink_dir, lang=lang, title_dir=title_dir)
 
-    def create_title_metadata_dir(self, *, title: Title, symlink_dir: Path, categories: list[str]) -> None:
-        """Create the title metadata dir for a title."""
+    def create_title_metadata_dir(
+        self,
+        *,
+        title: Title,
+        symlink_dir: Path,
+        categories: list[str],
+        category_things: dict[str, list[str]] | None = None,
+    ) -> None:
+        """Create the title metadata dir for a title, using the category_things from build_category_index() if given."""
         # /movies/playtime/.titles/
         titles_dir = symlink_dir / ".titles"
         # /movies/playtime/.titles/tt6264654/
@@ -559,7 +966,10 @@ class Playtime:
                 continue
             # /movies/playtime/.titles/tt6264654/category
             category_dir = title_dir / category
-            things = self.get_category_things(title=title, category=category)
+            if category_things is not None and category in category_things:
+                things = category_things[category]
+            else:
+                things = self.get_category_things(title=title, category=category)
             if not things:
                 if category_dir.exists():
                     category_dir.rmdir()
@@ -575,6 +985,25 @@ class Playtime:
     def symlink_cover(self, cover_dest_dir: Path, symlink_dir: Path, title: Title, lang: str) -> None:
         """Symlink the cover for this title."""
         logger.debug(f"Creating cover symlink for {title} in {cover_dest_dir} with symlink dir {symlink_dir}")
+        coverpath = self.copy_cover_to_symlink_dir(symlink_dir=symlink_dir, title=title, lang=lang)
+        if coverpath is None:
+            return
+        coverdest = cover_dest_dir / "poster.jpg"
+        # make symlink destination relative
+        relcoverpath = os.path.relpath(coverpath, coverdest.parent)
+        logger.debug(f"Creating cover symlink for {title} from {coverdest} to {relcoverpath}")
+        self.replace_symlink(target=relcoverpath, linkpath=coverdest)
+
+    def replace_symlink(self, target: str, linkpath: Path) -> None:
+        """Create a symlink at linkpath, replacing any existing file or symlink there."""
+        try:
+            linkpath.symlink_to(target)
+        except FileExistsError:
+            linkpath.unlink()
+            linkpath.symlink_to(target)
+
+    def copy_cover_to_symlink_dir(self, symlink_dir: Path, title: Title, lang: str) -> Path | None:
+        """Copy the cover for this title to the symlink dir unless it is already there, return the path or None."""
         # /movies/playtime/.titles/
         titles_dir = symlink_dir / ".titles"
         # /movies/playtime/.titles/tt6264654/
@@ -587,26 +1016,15 @@ class Playtime:
             coversource = self.get_coverpath(title=title, lang=lang)
             if not coversource.exists():
                 logger.debug(f"Cover {coversource} doesn't exist")
-                return
-            # copy cover from the source
-            shutil.copy(coversource, coverpath)
-        coverdest = cover_dest_dir / "poster.jpg"
-        # make symlink destination relative
-        relcoverpath = os.path.relpath(coverpath, coverdest.parent)
-        if coverdest.exists():
-            coverdest.unlink()
-        logger.debug(f"Creating cover symlink for {title} from {coverdest} to {relcoverpath}")
-        coverdest.symlink_to(relcoverpath)
+                return None
+            # covers in the cache are replaced rather than modified in place, so hardlinks are safe
+            self.link_or_copy(src=coversource, dst=coverpath)
+        return coverpath
 
-    def get_category_subdir(
-        self, category_dir: Path, category: str, thing: str, title: Title, accept_languages: list[str]
-    ) -> Path:
-        """Return the subdir to use for this title in this category."""
+    def get_category_subdir(self, category_dir: Path, category: str, thing: str, title: Title, dirname: str) -> Path:
+        """Return the subdir to use for this title in this category, dirname is from get_title_dirname()."""
         subdir: Path
         thing = str(thing).replace(os.sep, "_")
-        aka = self.get_title_aka(title=title, accept_languages=accept_languages)
-        aka = aka.replace(os.sep, "_")
-        dirname = f"{aka} ({title.premiered})"
         thing_dir = self.get_thingdir(thing=thing, category=category, category_dir=category_dir, many=True)
         # a few categories have special naming of the title dir
         if category == "rating":
@@ -657,7 +1075,8 @@ class Playtime:
     def rename_dirs_with_counts(self, directories: list[Path], unit: str) -> None:
         """Rename the dirs with the number of things in them."""
         for directory in directories:
-            count = len([d for d in directory.iterdir() if d.is_dir() and d.name != "metadata"])
+            with os.scandir(directory) as entries:
+                count = sum(1 for entry in entries if entry.is_dir() and entry.name != "metadata")
             countdir = directory.parent / f"{directory.name} ({count} {unit})"
             logger.debug(f"Renaming {directory} to {countdir}")
             directory.rename(countdir)
@@ -677,11 +1096,10 @@ class Playtime:
 
     def get_title_aka(self, title: Title, accept_languages: list[str]) -> str:
         """Return the best aka for a title considering accept_languages."""
-        if not title.cgngdata.exists():  # type: ignore[attr-defined]
-            return title.primary_title
-
         # language code of the cgngdata is not important here, just get any
-        cgngdata = title.cgngdata.first()  # type: ignore[attr-defined]
+        cgngdata = self.get_any_cgngdata(title=title)
+        if cgngdata is None:
+            return title.primary_title
 
         # use original title if cgngdata["language_codes"] containes one of the acceptable_languages
         if cgngdata.data["language_codes"] and cgngdata.data["language_codes"][0] in accept_languages:
@@ -691,13 +1109,22 @@ class Playtime:
         # use the primary title
         return title.primary_title
 
+    def get_title_dirname(self, title: Title, accept_languages: list[str]) -> str:
+        """Return the dirname to use for a title in symlink dirs."""
+        aka = self.get_title_aka(title=title, accept_languages=accept_languages)
+        aka = aka.replace(os.sep, "_")
+        return f"{aka} ({title.premiered})"
+
+    def get_any_cgngdata(self, title: Title) -> CGNGData | None:
+        """Return the first CGNGData object for a title in any language, using prefetched cgngdata if available."""
+        return min(title.cgngdata.all(), key=lambda cgngdata: cgngdata.pk, default=None)  # type: ignore[attr-defined]
+
     def get_title_language(self, title: Title, accept_languages: list[str]) -> str:
         """Return the best language code to use for this title."""
-        if not title.cgngdata.exists():  # type: ignore[attr-defined]
-            return "en"
-
         # language code of the cgngdata is not important, just get any
-        cgngdata = title.cgngdata.first()  # type: ignore[attr-defined]
+        cgngdata = self.get_any_cgngdata(title=title)
+        if cgngdata is None:
+            return "en"
         if (
             "language_codes" in cgngdata.data
             and cgngdata.data["language_codes"]
@@ -719,64 +1146,20 @@ class Playtime:
 ############## BOILERPLATE #########################################################################
 
 
-def get_parser() -> argparse.ArgumentParser:
-    """Create an argparse monster."""
-    parser = argparse.ArgumentParser(
-        prog="Playtime",
-        description=f"Playtime version {__version__}.",
-        formatter_class=RichHelpFormatter,
-    )
-
-    ###########################################
-    # global options
-    parser.add_argument(
-        "-c",
-        "--cache-directory",
-        type=Path,
-        help="Cache directory path. Defaults to ~/.cache/playtime/",
-        default=Path("~/.cache/playtime/"),
-    )
+def add_languages_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the -l/--languages argument used by several subcommands."""
     parser.add_argument(
         "-l",
-        "--log-level",
-        dest="log-level",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        help="Logging level. One of DEBUG, INFO, WARNING, ERROR, CRITICAL. Defaults to INFO.",
-        default="INFO",
-    )
-    parser.add_argument(
-        "-q",
-        "--quiet",
-        action="store_const",
-        dest="log-level",
-        const="WARNING",
-        help="Quiet mode. No output at all if no errors are encountered. Equal to setting --log-level=WARNING.",
-        default=argparse.SUPPRESS,
-    )
-    parser.add_argument(
-        "-v",
-        "--verbose",
-        action="store_const",
-        dest="log-level",
-        const="DEBUG",
-        help="Verbose/debug mode. Equal to setting --log-level=DEBUG.",
-        default=argparse.SUPPRESS,
-    )
-    parser.add_argument(
-        "-V",
-        "--version",
-        action="store_true",
-        help="Show version and exit",
-        default=argparse.SUPPRESS,
+        "--languages",
+        type=parse_comma_str_to_list,
+        default=[],
+        help="Comma-separated list of acceptable non-english languages.",
     )
-    subparsers = parser.add_subparsers(dest="subparser_name", help="Playtime subcommand (required).")
 
-    ###########################################
-    # playtime identify
-    identify_parser = subparsers.add_parser(
-        "identify", help="Identify titles in directories, and update local database with the results."
-    )
-    identify_parser.add_argument(
+
+def add_identify_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime identify'."""
+    parser.add_argument(
         "titledirs",
         type=Path,
         nargs="+",
@@ -785,28 +1168,22 @@ def get_parser() -> argparse.ArgumentParser:
             "Supports shell globs (like /movies/*). Supports multiple dirs (like /a/* /b/*)."
         ),
     )
-    identify_parser.add_argument(
+    parser.add_argument(
         "-f",
         "--force",
         action="store_true",
         default=False,
         help="Attempt (re)identification even if the directory is already known in the local database.",
     )
-    identify_parser.add_argument(
-        "-l",
-        "--languages",
-        type=parse_comma_str_to_list,
-        default=[],
-        help="Comma-separated list of acceptable non-english languages.",
-    )
-    identify_parser.add_argument(
+    add_languages_argument(parser=parser)
+    parser.add_argument(
         "-p",
         "--persist",
         action="store_true",
         default=False,
         help="Persist directory identification by writing the IMDB URL to imdb.txt.",
     )
-    identify_parser.add_argument(
+    parser.add_argument(
         "-t",
         "--ignore-textfiles",
         action="store_true",
@@ -814,113 +1191,60 @@ def get_parser() -> argparse.ArgumentParser:
         help="Ignore IMDB IDs in textfiles in each directory when identifying.",
     )
 
-    ###########################################
-    # playtime extrameta
-    extrameta_parser = subparsers.add_parser("extrameta", help="Get/update extra metadata (cover+ranking) from IMDB.")
-    extrameta_parser.add_argument(
-        "-l",
-        "--languages",
-        type=parse_comma_str_to_list,
-        default=[],
-        help="Comma-separated list of acceptable non-english languages.",
-    )
 
-    ###########################################
-    # playtime symlink
-    symlink_parser = subparsers.add_parser("symlink", help="Create directory hierachy with title categories.")
-    symlink_parser.add_argument(
+def add_extrameta_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime extrameta'."""
+    add_languages_argument(parser=parser)
+
+
+def add_symlink_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime symlink'."""
+    parser.add_argument(
         "symlinkdir",
         type=Path,
         help="Required. The directory in which to create the title category symlinks.",
     )
-    symlink_parser.add_argument(
+    parser.add_argument(
         "-c",
         "--categories",
         nargs="+",
-        default=[
-            "genres",
-            "years",
-            "directors",
-            "producers",
-            "writers",
-            "composers",
-            "actors",
-            "selfs",
-            "runtime",
-            "rating",
-            "top_ranking",
-            "bottom_ranking",
-            "language",
-            "languages",
-            "unidentified",
-            "duplicates",
-        ],
+        default=list(SYMLINK_CATEGORIES),
         help="Movie categories to enable for 'playtime symlink'.",
     )
-    symlink_parser.add_argument(
-        "-l",
-        "--languages",
-        type=parse_comma_str_to_list,
-        default=[],
-        help="Comma-separated list of acceptable non-english languages.",
-    )
+    add_languages_argument(parser=parser)
 
-    ###########################################
-    # playtime ls
-    subparsers.add_parser("ls", help="List all known directories.")
 
-    ###########################################
-    # playtime import
-    import_parser = subparsers.add_parser("import", help="Downloading and importing IMDB data")
-    import_parser.add_argument(
+def add_ls_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime ls', which has none."""
+
+
+def add_skip_dataset_arguments(parser: argparse.ArgumentParser, action: str) -> None:
+    """Add a --skip-<dataset> argument for each IMDB dataset, action is import or export."""
+    for dataset in IMDB_DATASETS:
+        parser.add_argument(
+            f"--skip-{dataset.replace('.', '-')}",
+            action="store_true",
+            default=False,
+            help=f"Do not {action} {dataset}.tsv.gz.",
+        )
+
+
+def add_import_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime import'."""
+    parser.add_argument(
         "--download-dir",
         type=Path,
-        default=Path.home() / ".cache/django-imdb-tsv-data",
-        help="Download directory for IMDB datadumps.",
+        default=None,
+        help="Download directory for IMDB datadumps. Defaults to ~/.cache/django-imdb-tsv-data/",
     )
-    import_parser.add_argument(
+    parser.add_argument(
         "--download-host",
         type=str,
         default="datasets.imdbws.com",
         help="Hostname from which to download IMDB data dumps, defaults to datasets.imdbws.com",
     )
-    import_parser.add_argument(
-        "--skip-name-basics",
-        action="store_true",
-        default=False,
-        help="Do not import name.basics.tsv.gz.",
-    )
-    import_parser.add_argument(
-        "--skip-title-basics",
-        action="store_true",
-        default=False,
-        help="Do not import title.basics.tsv.gz.",
-    )
-    import_parser.add_argument(
-        "--skip-title-akas",
-        action="store_true",
-        default=False,
-        help="Do not import title.akas.tsv.gz.",
-    )
-    import_parser.add_argument(
-        "--skip-title-principals",
-        action="store_true",
-        default=False,
-        help="Do not import title.principals.tsv.gz.",
-    )
-    import_parser.add_argument(
-        "--skip-title-episodes",
-        action="store_true",
-        default=False,
-        help="Do not import title.episodes.tsv.gz.",
-    )
-    import_parser.add_argument(
-        "--skip-title-ratings",
-        action="store_true",
-        default=False,
-        help="Do not import title.ratings.tsv.gz.",
-    )
-    import_parser.add_argument(
+    add_skip_dataset_arguments(parser=parser, action="import")
+    parser.add_argument(
         "--max-tsv-age-seconds",
         default=86400 * 14,
         type=int,
@@ -930,70 +1254,170 @@ def get_parser() -> argparse.ArgumentParser:
         ),
     )
 
-    ###########################################
-    # playtime export
-    export_parser = subparsers.add_parser("export", help="Exporting IMDB TSV files from DB")
-    export_parser.add_argument(
+
+def add_export_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments for 'playtime export'."""
+    parser.add_argument(
         "--export-dir",
         type=Path,
-        default=Path.home() / "imdbexport",
-        help="Directory for IMDB datadumps.",
+        default=None,
+        help="Directory for IMDB datadumps. Defaults to ~/imdbexport/",
     )
-    export_parser.add_argument(
-        "--skip-name-basics",
-        action="store_true",
-        default=False,
-        help="Do not export name.basics.tsv.gz.",
+    add_skip_dataset_arguments(parser=parser, action="export")
+
+
+# the playtime subcommands, with the help text and the function adding the arguments for each subcommand
+SUBCOMMANDS: dict[str, tuple[str, Callable[[argparse.ArgumentParser], None]]] = {
+    "identify": (
+        "Identify titles in directories, and update local database with the results.",
+        add_identify_arguments,
+    ),
+    "extrameta": ("Get/update extra metadata (cover+ranking) from IMDB.", add_extrameta_arguments),
+    "symlink": ("Create directory hierachy with title categories.", add_symlink_arguments),
+    "ls": ("List all known directories.", add_ls_arguments),
+    "import": ("Downloading and importing IMDB data", add_import_arguments),
+    "export": ("Exporting IMDB TSV files from DB", add_export_arguments),
+}
+
+
+@functools.cache
+def get_parser(subcommand: str | None = None) -> argparse.ArgumentParser:
+    """Create an argparse monster, only once per process and subcommand.
+
+    All subcommands are listed, but only the arguments of the given subcommand are added.
+    Parsing arguments does not change the parser.
+    """
+    # only needed for building the parser
+    from rich_argparse import RichHelpFormatter  # noqa: PLC0415
+
+    parser = argparse.ArgumentParser(
+        prog="Playtime",
+        description=f"Playtime version {__version__}.",
+        formatter_class=RichHelpFormatter,
     )
-    export_parser.add_argument(
-        "--skip-title-basics",
-        action="store_true",
-        default=False,
-        help="Do not export title.basics.tsv.gz.",
+
+    ###########################################
+    # global options
+    parser.add_argument(
+        "-c",
+        "--cache-directory",
+        type=Path,
+        help="Cache directory path. Defaults to ~/.cache/playtime/",
+        default=Path("~/.cache/playtime/"),
     )
-    export_parser.add_argument(
-        "--skip-title-akas",
-        action="store_true",
-        default=False,
-        help="Do not export title.akas.tsv.gz.",
+    parser.add_argument(
+        "-l",
+        "--log-level",
+        dest="log_level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Logging level. One of DEBUG, INFO, WARNING, ERROR, CRITICAL. Defaults to INFO.",
+        default="INFO",
     )
-    export_parser.add_argument(
-        "--skip-title-principals",
-        action="store_true",
-        default=False,
-        help="Do not export title.principals.tsv.gz.",
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_const",
+        dest="log_level",
+        const="WARNING",
+        help="Quiet mode. No output at all if no errors are encountered. Equal to setting --log-level=WARNING.",
+        default=argparse.SUPPRESS,
     )
-    export_parser.add_argument(
-        "--skip-title-episodes",
-        action="store_true",
-        default=False,
-        help="Do not export title.episodes.tsv.gz.",
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_const",
+        dest="log_level",
+        const="DEBUG",
+        help="Verbose/debug mode. Equal to setting --log-level=DEBUG.",
+        default=argparse.SUPPRESS,
     )
-    export_parser.add_argument(
-        "--skip-title-ratings",
+    parser.add_argument(
+        "-V",
+        "--version",
         action="store_true",
-        default=False,
-        help="Do not export title.ratings.tsv.gz.",
+        help="Show version and exit",
+        default=argparse.SUPPRESS,
     )
+    # give the subcommand prog prefix, rather than having argparse render a usage string to find it
+    subparsers = parser.add_subparsers(dest="subparser_name", help="Playtime subcommand (required).", prog=parser.prog)
+    for name, (helptext, add_arguments) in SUBCOMMANDS.items():
+        if name != subcommand:
+            # the other subcommands only need a name and a help text, and must not consume -h/--help
+            subparsers.add_parser(name, help=helptext, add_help=False)
+            continue
+        add_arguments(subparsers.add_parser(name, help=helptext))
     return parser
 
 
 def parse_comma_str_to_list(values: str) -> list[str]:
-    """Parse comma-separated string to list."""
-    return values.split(",")
+    """Parse comma-separated string to list, skipping empty values."""
+    return [value for value in values.split(",") if value]
 
 
 def parse_args(
     mockargs: list[str] | None = None,
 ) -> tuple[argparse.ArgumentParser, argparse.Namespace]:
     """Create an argparse object and parse either mockargs (for testing) or sys.argv[1:] (for real)."""
-    parser = get_parser()
-    args = parser.parse_args(mockargs if mockargs else sys.argv[1:])
+    argv = mockargs or sys.argv[1:]
+    # find the subcommand first, and then parse with only the arguments of that subcommand added.
+    # without global options the subcommand is the first argument and can be found without parsing
+    if argv and argv[0] in SUBCOMMANDS:
+        subcommand = argv[0]
+    else:
+        known, _ = get_parser(subcommand=None).parse_known_args(argv)
+        subcommand = known.subparser_name
+    parser = get_parser(subcommand=subcommand)
+    args = parser.parse_args(argv)
     return parser, args
 
 
+class PlainFormatter(logging.Formatter):
+    """Log formatter for plain log output, rendering the rich markup and emoji codes in messages as plain text."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:  # noqa: N802
+        """Render the markup in the message before formatting it."""
+        # use the message as it is if it is not valid markup
+        with contextlib.suppress(MarkupError):
+            record.message = render(record.message, emoji=True).plain
+        return super().formatMessage(record)
+
+
+class RichFormatter(logging.Formatter):
+    """Log formatter for the rich log handler, escaping tracebacks so they are not parsed as markup."""
+
+    def formatException(self, ei: logging._SysExcInfoType) -> str:  # noqa: N802
+        """Escape the markup characters in the formatted traceback."""
+        return escape(super().formatException(ei))
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler for a queue in this process, passing log records on to the listener unchanged."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return the record as it is.
+
+        The default prepare() merges exc_info into the message so records can be pickled, which stops the
+        traceback from being formatted by the log handler.
+        """
+        return record
+
+
+def use_pretty_logs() -> bool:
+    """Return True if the rich log handler should be used, see PRETTY_LOGS_ENV."""
+    pretty = os.environ.get(PRETTY_LOGS_ENV)
+    if pretty is None:
+        return sys.stdout.isatty()
+    return pretty != "0"
+
+
 def configure_logger(level: str) -> None:
-    """Configure the logger."""
+    """Configure the logger, or only the log level if logging is already configured."""
+    rootlogger = logging.getLogger("")
+    if rootlogger.handlers:
+        # for example by an earlier main() call in the same process
+        rootlogger.setLevel(level)
+        return
+
     # determine log format and level
     if level == "DEBUG":
         console_logformat = "%(asctime)s %(name)s.%(funcName)s():%(lineno)i:  %(message)s"
@@ -1001,80 +1425,129 @@ def configure_logger(level: str) -> None:
     else:
         console_logformat = "%(message)s"
         datefmt = "[%X]"
-    # configure the logger
-    logging.basicConfig(
-        level=level,
-        format=console_logformat,
-        datefmt=datefmt,
-        handlers=[RichHandler(markup=True)],
-    )
+    # the rich log handler is many times slower than a plain stream handler, so only use it when it is seen
+    handler: logging.Handler
+    if use_pretty_logs():
+        from enrich.logging import RichHandler  # noqa: PLC0415
 
-    # also configure the root logger
-    rootlogger = logging.getLogger("")
+        handler = RichHandler(markup=True)
+        handler.setFormatter(RichFormatter(fmt=console_logformat, datefmt=datefmt))
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(PlainFormatter(fmt=f"%(levelname)s {console_logformat}", datefmt=datefmt))
+    # log records are put on a queue and handled in a background thread,
+    # so the threads doing the work never wait for log output
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    # configure the root logger
+    rootlogger.addHandler(queue_handler)
     rootlogger.setLevel(level)
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    # handle the remaining log records on exit
+    atexit.register(listener.stop)
 
 
-def main(mockargs: list[str] | None = None) -> None:
-    """Get command-line args, configure logging, and start Playtime."""
-    # get argparser and parse args
-    parser, args = parse_args(mockargs)
+def import_command(args: argparse.Namespace) -> None:
+    """Run 'playtime import'."""
+    kwargs = {key: value for key, value in vars(args).items() if key in IMPORT_ARGS}
+    # find the default when running the command, not when building the parser
+    if kwargs["download_dir"] is None:
+        kwargs["download_dir"] = Path.home() / ".cache/django-imdb-tsv-data"
+    import_tsv_files(**kwargs)
 
-    # show version and exit?
-    if "version" in args:
-        print(f"Playtime version {__version__}.")  # noqa: T201
-        sys.exit(0)
 
-    # configure logger
-    configure_logger(level=getattr(args, "log-level"))
+def export_command(args: argparse.Namespace) -> None:
+    """Run 'playtime export'."""
+    kwargs = {key: value for key, value in vars(args).items() if key in EXPORT_ARGS}
+    # find the default when running the command, not when building the parser
+    if kwargs["export_dir"] is None:
+        kwargs["export_dir"] = Path.home() / "imdbexport"
+    export_tsv_files(**kwargs)
+
 
-    # initialise Playtime object
+def extrameta_command(args: argparse.Namespace) -> None:
+    """Run 'playtime extrameta'."""
     pt = Playtime(cache_directory=args.cache_directory)
+    pt.update_extra_metadata(accept_languages=args.languages)
 
-    if args.subparser_name == "import":
-        import_tsv_files(
-            download_dir=args.download_dir,
-            download_host=args.download_host,
-            skip_name_basics=args.skip_name_basics,
-            skip_title_basics=args.skip_title_basics,
-            skip_title_akas=args.skip_title_akas,
-            skip_title_principals=args.skip_title_principals,
-            skip_title_episodes=args.skip_title_episodes,
-            skip_title_ratings=args.skip_title_ratings,
-            max_tsv_age_seconds=args.max_tsv_age_seconds,
-        )
 
-    elif args.subparser_name == "export":
-        export_tsv_files(
-            export_dir=args.export_dir,
-            skip_name_basics=args.skip_name_basics,
-            skip_title_basics=args.skip_title_basics,
-            skip_title_akas=args.skip_title_akas,
-            skip_title_principals=args.skip_title_principals,
-            skip_title_episodes=args.skip_title_episodes,
-            skip_title_ratings=args.skip_title_ratings,
-        )
+def identify_command(args: argparse.Namespace) -> None:
+    """Run 'playtime identify'."""
+    pt = Playtime(cache_directory=args.cache_directory)
+    pt.identify_directories(
+        directories=args.titledirs,
+        force=args.force,
+        ignore_textfiles=args.ignore_textfiles,
+        persist=args.persist,
+        accept_languages=args.languages,
+    )
 
-    elif args.subparser_name == "extrameta":
-        pt.update_extra_metadata(accept_languages=args.languages)
 
-    elif args.subparser_name == "identify":
-        pt.identify_directories(
-            directories=args.titledirs,
-            force=args.force,
-            ignore_textfiles=args.ignore_textfiles,
-            persist=args.persist,
-            accept_languages=args.languages,
-        )
+def symlink_command(args: argparse.Namespace) -> None:
+    """Run 'playtime symlink'."""
+    pt = Playtime(cache_directory=args.cache_directory)
+    pt.create_symlink_dirs(symlink_dir=args.symlinkdir, categories=args.categories, accept_languages=args.languages)
+
 
-    elif args.subparser_name == "symlink":
-        pt.create_symlink_dirs(symlink_dir=args.symlinkdir, categories=args.categories, accept_languages=args.languages)
+def ls_command(args: argparse.Namespace) -> None:
+    """Run 'playtime ls'."""
+    pt = Playtime(cache_directory=args.cache_directory)
+    pt.list_directories()
 
-    elif args.subparser_name == "ls":
-        pt.list_directories()
 
-    else:
+# the function running each playtime subcommand, only the commands working on the
+# Playtime cache directory initialise a Playtime object
+COMMANDS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "import": import_command,
+    "export": export_command,
+    "extrameta": extrameta_command,
+    "identify": identify_command,
+    "symlink": symlink_command,
+    "ls": ls_command,
+}
+
+
+def version_requested(argv: list[str]) -> bool:
+    """Return True if -V/--version is given before any non-option argument, without parsing the arguments."""
+    for arg in argv:
+        if not arg.startswith("-"):
+            # a subcommand or an option value, leave the rest to argparse
+            return False
+        if arg in ("-V", "--version"):
+            return True
+    return False
+
+
+def print_version_and_exit() -> NoReturn:
+    """Print the Playtime version and exit."""
+    print(f"Playtime version {__version__}.")  # noqa: T201
+    sys.exit(0)
+
+
+def main(mockargs: list[str] | None = None) -> None:
+    """Get command-line args, configure logging, and start Playtime."""
+    # show version and exit without building the parser?
+    if version_requested(mockargs or sys.argv[1:]):
+        print_version_and_exit()
+
+    # get argparser and parse args
+    parser, args = parse_args(mockargs)
+
+    # show version and exit?
+    if "version" in args:
+        print_version_and_exit()
+
+    # configure logger
+    configure_logger(level=args.log_level)
+
+    # run the subcommand
+    command = COMMANDS.get(args.subparser_name)
+    if command is None:
         logger.error("Playtime subcommand missing!")
         parser.print_help()
+    else:
+        command(args)
 
     logger.debug(":person_raising_hand: Playtime is over - bye!")
 
@@ -1,14 +1,20 @@
 # type: ignore  # noqa: PGH003
 """Basic tests for playtime. Requires internet and imdb to be working."""
 
+import argparse
+import errno
+import os
 from pathlib import Path
 
-from playtime import Playtime
+import playtime as playtime_module
+from conftest import PlaytimeFixture
+from playtime import Playtime, parse_args, parse_comma_str_to_list, version_requested
 
 
-def test_update_cache(playtime: tuple[Playtime, Path]) -> None:
+def test_update_cache(playtime: PlaytimeFixture) -> None:
     """Test basic 'playtime update' functionality."""
-    pt, moviedir = playtime
+    pt = playtime.pt
+    moviedir = playtime.movies
     assert "tt0088944" in pt.cache.movies
     assert "tt11466222" in pt.cache.movies
 
@@ -19,7 +25,7 @@ def test_update_cache(playtime: tuple[Playtime, Path]) -> None:
 
 def test_cover_download(playtime) -> None:
     """Test 'playtime download'."""
-    pt, moviedir = playtime
+    pt = playtime.pt
     pt.download_covers(save_covers_in_moviedirs=False, force_download=False)
     pt.download_covers(save_covers_in_moviedirs=False, force_download=False)
     assert (pt.cache.cachedir / "covers/tt0088944.jpg").exists()
@@ -36,7 +42,8 @@ def test_cover_download(playtime) -> None:
 
 def test_symlink_dirs(tmpdir_factory, playtime) -> None:
     """Test 'playtime symlink'."""
-    pt, moviedir = playtime
+    pt = playtime.pt
+    moviedir = playtime.movies
     symlink_dir = Path(tmpdir_factory.mktemp("symlinks"))
     pt.create_symlink_dirs(
         symlink_dir=symlink_dir, categories=["genres", "year", "directors", "actors"], relative=False
@@ -54,3 +61,109 @@ def test_symlink_dirs(tmpdir_factory, playtime) -> None:
     assert commandolink.readlink() == Path("../../../../movies0/movies2/commando.1985")
     assert jackasslink.is_symlink()
     assert jackasslink.readlink() == Path("../../../../movies0/movies2/jackass4")
+
+
+def record_get_parser_calls(monkeypatch) -> list[str | None]:
+    """Patch get_parser() to record the subcommand of each call, and return the list of recorded subcommands."""
+    calls: list[str | None] = []
+    get_parser = playtime_module.get_parser
+
+    def recording_get_parser(subcommand: str | None = None) -> argparse.ArgumentParser:
+        calls.append(subcommand)
+        return get_parser(subcommand=subcommand)
+
+    monkeypatch.setattr(playtime_module, "get_parser", recording_get_parser)
+    return calls
+
+
+def test_parse_args_subcommand_first(monkeypatch) -> None:
+    """Test that a leading subcommand is found without parsing the arguments twice."""
+    calls = record_get_parser_calls(monkeypatch)
+    _, args = parse_args(["identify", "-f", "/movies"])
+    assert calls == ["identify"]
+    assert args.subparser_name == "identify"
+    assert args.force
+    assert args.titledirs == [Path("/movies")]
+
+
+def test_parse_args_global_options_first(monkeypatch) -> None:
+    """Test that the subcommand is found with parse_known_args() when global options come first."""
+    calls = record_get_parser_calls(monkeypatch)
+    _, args = parse_args(["-c", "/cache", "-v", "symlink", "/symlinks", "-c", "genres"])
+    assert calls == [None, "symlink"]
+    assert args.subparser_name == "symlink"
+    assert args.cache_directory == Path("/cache")
+    assert args.log_level == "DEBUG"
+    assert args.categories == ["genres"]
+
+
+def test_version_requested() -> None:
+    """Test finding -V/--version before the subcommand."""
+    assert version_requested(["-V"])
+    assert version_requested(["-q", "--version"])
+    assert not version_requested([])
+    assert not version_requested(["ls", "-V"])
+    assert not version_requested(["-c", "/cache", "-V"])
+
+
+def test_parse_comma_str_to_list() -> None:
+    """Test parsing comma-separated strings, skipping empty values."""
+    assert parse_comma_str_to_list("da,sv") == ["da", "sv"]
+    assert parse_comma_str_to_list(",da,,sv,") == ["da", "sv"]
+    assert parse_comma_str_to_list("") == []
+
+
+def test_find_textfiles_extensions(tmp_path) -> None:
+    """Test that textfile extensions are matched case-insensitively and returned in the order of the extensions."""
+    pt = Playtime(cache_directory=tmp_path / "cache")
+    moviedir = tmp_path / "movie"
+    moviedir.mkdir()
+    for name in ("a.NFO", "b.txt", "c.Txt", "d.srt", "nfo", "e.txt.bak"):
+        (moviedir / name).write_text("tt0088944")
+    (moviedir / "dir.txt").mkdir()
+    assert sorted(pt.find_textfiles(moviedir=moviedir)[:2]) == [moviedir / "b.txt", moviedir / "c.Txt"]
+    assert pt.find_textfiles(moviedir=moviedir)[2:] == [moviedir / "a.NFO"]
+    assert pt.find_textfiles(moviedir=moviedir, extensions=["NFO"]) == [moviedir / "a.NFO"]
+    assert pt.find_textfiles(moviedir=moviedir, extensions=[".nfo"]) == []
+    assert pt.find_textfiles(moviedir=tmp_path / "missing") == []
+
+
+def test_search_imdb_id_in_textfile(tmp_path) -> None:
+    """Test finding IMDB ids in small textfiles and in textfiles larger than a memory page."""
+    pt = Playtime(cache_directory=tmp_path / "cache")
+    small = tmp_path / "small.nfo"
+    small.write_bytes(b"https://www.imdb.com/title/tt0088944/ \xff\xfe")
+    assert pt.search_imdb_id_in_textfile(textfile=small) == "tt0088944"
+    large = tmp_path / "large.nfo"
+    large.write_bytes(b"x" * 100 * 1024 + b"\ntt11466222\ntt0088944\n")
+    assert pt.search_imdb_id_in_textfile(textfile=large) == "tt11466222"
+    empty = tmp_path / "empty.nfo"
+    empty.touch()
+    assert pt.search_imdb_id_in_textfile(textfile=empty) is None
+    assert pt.search_imdb_id_in_textfile(textfile=tmp_path / "missing.nfo") is None
+
+
+def test_link_or_copy(tmp_path) -> None:
+    """Test hardlinking, and copying when hardlinking fails."""
+    pt = Playtime(cache_directory=tmp_path / "cache")
+    src = tmp_path / "cover.jpg"
+    src.write_bytes(b"cover")
+    pt.link_or_copy(src=src, dst=tmp_path / "linked.jpg")
+    assert (tmp_path / "linked.jpg").samefile(src)
+
+
+def test_link_or_copy_fallback(tmp_path, monkeypatch) -> None:
+    """Test that link_or_copy() copies the file when hardlinking is not possible."""
+    pt = Playtime(cache_directory=tmp_path / "cache")
+    src = tmp_path / "cover.jpg"
+    src.write_bytes(b"cover")
+
+    def link(src: Path, dst: Path) -> None:
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, "link", link)
+    dst = tmp_path / "copied.jpg"
+    pt.link_or_copy(src=src, dst=dst)
+    assert dst.read_bytes() == b"cover"
+    assert not dst.samefile(src)
+    assert not dst.with_suffix(".part").exists()